@@ -1,12 +1,15 @@
-import os, json, shutil
+import os, re, json, shutil
 import ast
 import git
 from flask import Flask, render_template, request, jsonify, session
 from dotenv import load_dotenv
-import requests
-import threading, logging
+import threading, logging, atexit
 import hashlib
 from urllib.parse import urlparse
+from ast_builder import (index_project, build_call_tree_from_index, function_fingerprint,
+                         get_metrics_page, METRIC_FIELDS)
+from llm_client import LLMClient
+from job_registry import JobRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,10 +18,46 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = "123"  # Replace with a secure random string
 
-DEEPSEEK_URL = "https://api.deepseek.com/v1/chat/completions"
-API_KEY = "sk-7f96e82b77a34e29bd6c1160c2056a38"  # From your input
+DEEPSEEK_URL = os.getenv("DEEPSEEK_URL", "https://api.deepseek.com/v1/chat/completions")
+API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-7f96e82b77a34e29bd6c1160c2056a38")  # From your input
 
-progress_data = {}
+# Shared by every LLM call so rate limits hold across request threads
+llm = LLMClient(DEEPSEEK_URL, API_KEY)
+
+# Job progress survives restarts when JOB_STATE_PATH is set
+progress_data = JobRegistry(max_entries=1000, ttl=24 * 3600, persist_path=os.getenv("JOB_STATE_PATH"))
+atexit.register(progress_data.flush)
+
+# Call graph and search index by repo id, kept small since indexes are large
+project_indexes = JobRegistry(max_entries=16, ttl=3600, touch_on_read=True)
+
+# LLM summaries by repo id, kept apart from the indexes so a rebuild can restore them
+repo_summaries = JobRegistry(max_entries=1000, ttl=24 * 3600)
+
+# Striped locks so each repo is indexed by one thread at a time
+index_locks = [threading.Lock() for _ in range(16)]
+
+class ApiError(Exception):
+    """Error reported to the client with its own status code"""
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+class BadRequest(ApiError):
+    """Invalid request parameter, reported to the client as a 400"""
+    def __init__(self, message):
+        super().__init__(message, 400)
+
+def int_param(data, name, default, low, high):
+    """Read an integer request parameter and clamp it to [low, high]"""
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise BadRequest(f"{name} must be an integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    return min(high, max(low, value))
 
 SKIP_PROCESSING_LVL = 2
 
@@ -91,6 +130,61 @@ def clone_or_update_repo(repo_url):
         app.logger.error(f"Git operation failed: {str(e)}")
         raise RuntimeError(f"Repository management failed: {e.stderr}")
 
+def get_index_lock(repo_id):
+    return index_locks[int(repo_id, 16) % len(index_locks)]
+
+def get_project_index(repo_url, refresh=False):
+    """Get the call graph and search index for a cloned repository"""
+    repo_id = generate_repo_id(repo_url)
+    index = None if refresh else project_indexes.get(repo_id)
+    if index is None:
+        with get_index_lock(repo_id):
+            # Another request may have finished indexing while we waited
+            index = None if refresh else project_indexes.get(repo_id)
+            if index is None:
+                repo_path = get_repo_path(repo_url)
+                if not os.path.isdir(repo_path):
+                    raise RuntimeError("Repository has not been analyzed yet")
+                index = index_project(repo_path)
+                # Make summaries searchable where the function name is unambiguous
+                for name, summary in repo_summaries.get(repo_id, {}).items():
+                    index['search_index'].set_summary(name, summary)
+                project_indexes.set(repo_id, index)
+                app.logger.info(f"Indexed {len(index['search_index'].entries)} functions in {repo_path} "
+                                f"({len(index['duplicate_groups'])} duplicate groups)")
+    return index
+
+def build_readme_prompt(readme_content):
+    return f"""Analyze this README and identify the main entry file and key functionality. 
+    Your answer should only be a json that has an entry "entries", each main entry is an element of "entries".
+    "entries" should have entries "func_path" and "desc" where the path is just function name if at top level. File:\n{readme_content}"""
+
+def build_summary_prompt(function):
+    return f"""Summarize this function in 5-10 words for display, keep original name.
+    Then in 5-10 sentences, write a workflow description of the function.
+    Original name: {function['original_name']}
+    Code:
+    {function['code']}
+    Respond in JSON format: {{"summary": "...", "description": "..."}}"""
+
+def parse_llm_content(response_json):
+    """Parse the JSON answer out of a chat completion response"""
+    # Extract the content from the response
+    content = response_json['choices'][0]['message']['content']
+    
+    # The content is likely wrapped in ```json ... ``` code blocks
+    # Let's strip those and parse the JSON content
+    if content.startswith('```json'):
+        content = content.replace('```json', '', 1)
+    if content.endswith('```'):
+        content = content[:-3]
+    
+    # Parse the JSON string into a Python dictionary
+    return json.loads(content.strip())
+
+def fallback_summary(function):
+    return {"summary": function['original_name'], "description": "No description available"}
+
 def analyze_readme(repo_dir):
     readme_path = os.path.join(repo_dir, "README.md")
     
@@ -100,43 +194,15 @@ def analyze_readme(repo_dir):
     except FileNotFoundError:
         return "No README found"
 
-    prompt = f"""Analyze this README and identify the main entry file and key functionality. 
-    Your answer should only be a json that has an entry "entries", each main entry is an element of "entries".
-    "entries" should have entries "func_path" and "desc" where the path is just function name if at top level. File:\n{readme_content}"""
+    prompt = build_readme_prompt(readme_content)
     
     try:
-        response = requests.post(
-            DEEPSEEK_URL,
-            headers={"Authorization": f"Bearer {API_KEY}"},
-            json={
-                "messages": [{"role": "user", "content": prompt}],
-                "model": "deepseek-coder",
-                "max_tokens": 500  # 👈 Set max token count
-            },
-            timeout=30
-        )
+        response_json = llm.chat(prompt, max_tokens=500, timeout=30)
         
         # Log the response
-        app.logger.info(f"DeepSeek API Response: {response.json()}")
-        
-        if response.status_code != 200:
-            app.logger.error(f"API Error: {response.status_code} - {response.text}")
-            return "Analysis failed"
-
-        # Extract the content from the response
-        content = response.json()['choices'][0]['message']['content']
+        app.logger.info(f"DeepSeek API Response: {response_json}")
         
-        # The content is likely wrapped in ```json ... ``` code blocks
-        # Let's strip those and parse the JSON content
-        if content.startswith('```json'):
-            content = content.replace('```json', '', 1)
-        if content.endswith('```'):
-            content = content[:-3]
-        
-        # Parse the JSON string into a Python dictionary
-        parsed_content = json.loads(content.strip())
-        return parsed_content
-
+        return parse_llm_content(response_json)
         
     except Exception as e:
         app.logger.error(f"API Call Failed: {str(e)}")
@@ -156,7 +222,8 @@ def parse_functions(file_path):
                 code_segment = ast.get_source_segment(source_code, node)
                 functions.append({
                     "original_name": node.name,
-                    "code": code_segment
+                    "code": code_segment,
+                    "fingerprint": function_fingerprint(node)
                 })
         return functions
         
@@ -165,283 +232,403 @@ def parse_functions(file_path):
         return []
     
 def generate_function_summary(function):
-    prompt = f"""Summarize this function in 5-10 words for display, keep original name.
-    Then in 5-10 sentences, write a workflow description of the function.
-    Original name: {function['original_name']}
-    Code:
-    {function['code']}
-    Respond in JSON format: {{"summary": "...", "description": "..."}}"""
+    prompt = build_summary_prompt(function)
     
     try:
-        response = requests.post(
-            DEEPSEEK_URL,
-            headers={"Authorization": f"Bearer {API_KEY}"},
-            json={
-                "messages": [{"role": "user", "content": prompt}],
-                "model": "deepseek-coder",
-                "max_tokens": 500,
-            },
-        )
-        
-        if response.status_code != 200:
-            app.logger.error(f"API Error in function summary: {response.status_code} - {response.text}")
-            return {"summary": function['original_name'], "description": "No description available"}
-            
-        content = response.json()['choices'][0]['message']['content']
-        app.logger.info(content)
-        
-        # Clean up the JSON string if needed
-        if content.startswith('```json'):
-            content = content.replace('```json', '', 1)
-        if content.endswith('```'):
-            content = content[:-3]
-            
-        app.logger.info(content.strip())
-            
-        return json.loads(content.strip())
+        return parse_llm_content(llm.chat(prompt, max_tokens=500))
         
     except Exception as e:
         app.logger.error(f"Error generating function summary: {str(e)}")
-        return {"summary": function['original_name'], "description": "No description available"}
-    
-def build_hierarchy(repo_dir, repo_url=None):
-    hierarchy = []
-    
-    # Track progress for this repository
-    repo_id = None
-    if repo_url:
-        repo_id = generate_repo_id(repo_url)
-        progress_data[repo_id] = {
-            'status': 'processing',
-            'progress': 0,
-            'current_function': '',
-            'current_index': 0,
-            'total_functions': 0
-        }
-    
-    # Get entry file from README analysis
-    if SKIP_PROCESSING_LVL < 1:
-        readme_analysis = analyze_readme(repo_dir)
-    
-    # Find the main entry file from the README analysis
-    entry_file = "run_nerf.py"  # Default
-    if SKIP_PROCESSING_LVL < 1:
-        if "entries" in readme_analysis and len(readme_analysis["entries"]) > 0:
-            # Extract the first entry's func_path
-            main_entry = readme_analysis["entries"][0]["func_path"]
-            # If it contains parameters, extract just the filename
-            if " " in main_entry:
-                entry_file = main_entry.split(" ")[0]
-            else:
-                entry_file = main_entry
+        return fallback_summary(function)
     
+# Canned hierarchy used when SKIP_PROCESSING_LVL > 1
+SAMPLE_HIERARCHY = [
+    {
+        "summary": 'Parses configuration arguments for neural rendering',
+        "original": 'config_parser',
+        "description": 'The config_parser function sets up and returns an argument parser for configuring a neural rendering system. It handles various parameters including experiment setup (name, directories), training options (network architecture, learning rates), rendering settings (sample counts, view directions), and dataset specifications (LLFF/Blender formats). The parser supports both command-line arguments and configuration files, with defaults provided for most parameters. It includes specialized options for view synthesis techniques like slow-motion rendering and bullet time effects. The function ultimately returns the configured parser object which can be used to process input arguments.',
+        "children": [],  # Function calls will be populated on demand
+        "code": "def config_parser():\n    # Function code here"  # Store code for later extraction
+    },
+    {
+        "summary": 'Train neural radiance field model',
+        "original": 'train',
+        "description": 'The function loads LLFF dataset, processes poses and images, initializes a neural radiance field model, and trains it with optical flow and depth supervision. It handles various rendering modes (bullet time, slow motion), implements loss functions for scene flow and rendering, and periodically saves checkpoints and validation results. The training loop includes learning rate decay, hard mining for motion regions, and multi-stage optimization with different loss weights.',
+        "children": [],  # Function calls will be populated on demand
+        "code": "def train():\n    # Function code here"  # Store code for later extraction
+    }
+]
+
+DEFAULT_ENTRY_FILE = "run_nerf.py"
+
+def select_entry_file(readme_analysis):
+    """Find the main entry file from the README analysis"""
+    entry_file = DEFAULT_ENTRY_FILE
+    if "entries" in readme_analysis and len(readme_analysis["entries"]) > 0:
+        # Extract the first entry's func_path
+        main_entry = readme_analysis["entries"][0]["func_path"]
+        # If it contains parameters, extract just the filename
+        if " " in main_entry:
+            entry_file = main_entry.split(" ")[0]
+        else:
+            entry_file = main_entry
+    return entry_file
+
+def error_item(description):
+    return {
+        "summary": "Error",
+        "original": "error",
+        "description": description,
+        "children": [],
+        "code": ""
+    }
+
+def hierarchy_item(func, summary_data):
+    return {
+        "summary": summary_data.get('summary', func['original_name']),
+        "original": func['original_name'],
+        "description": summary_data.get('description', 'No description available'),
+        "children": [],  # Will be populated on demand
+        "code": func['code']  # Store the code for later use
+    }
+
+def duplicate_summary(source_name, summary_data, func):
+    """Reuse the summary of an identical function body for func"""
+    # The prompt keeps the original name, so swap in this duplicate's
+    pattern = re.compile(rf"\b{re.escape(source_name)}\b")
+    summary_data = dict(summary_data)
+    for field in ('summary', 'description'):
+        if isinstance(summary_data.get(field), str):
+            summary_data[field] = pattern.sub(func['original_name'], summary_data[field])
+    return summary_data
+
+# The steps below are shared by build_hierarchy here and its async
+# counterpart in async_app.py, which only differ in how they call the LLM
+
+def start_progress(repo_url):
+    """Reset progress for a repository and return its id"""
+    if not repo_url:
+        return None
+    repo_id = generate_repo_id(repo_url)
+    progress_data.set(repo_id, {
+        'status': 'processing',
+        'progress': 0,
+        'current_function': '',
+        'current_index': 0,
+        'total_functions': 0
+    })
+    return repo_id
+
+def update_summary_progress(repo_id, function_name, current_index, completed, total_functions):
+    if repo_id:
+        progress_data.update(
+            repo_id,
+            current_function=function_name,
+            current_index=current_index,
+            progress=int((completed / total_functions) * 100)
+        )
+
+def complete_progress(repo_id):
+    if repo_id:
+        progress_data.update(repo_id, status='complete', progress=100)
+
+def load_entry_functions(repo_dir, entry_file, repo_id):
+    """
+    Parse the functions of the entry file. Returns (hierarchy, None) when the
+    analysis ends early, otherwise (None, functions).
+    """
     app.logger.info(f"Using entry file: {entry_file}")
     
     # Parse entry file
     entry_path = os.path.join(repo_dir, entry_file)
     
     if SKIP_PROCESSING_LVL > 1:
-        hierarchy = [
-            {
-                "summary": 'Parses configuration arguments for neural rendering',
-                "original": 'config_parser',
-                "description": 'The config_parser function sets up and returns an argument parser for configuring a neural rendering system. It handles various parameters including experiment setup (name, directories), training options (network architecture, learning rates), rendering settings (sample counts, view directions), and dataset specifications (LLFF/Blender formats). The parser supports both command-line arguments and configuration files, with defaults provided for most parameters. It includes specialized options for view synthesis techniques like slow-motion rendering and bullet time effects. The function ultimately returns the configured parser object which can be used to process input arguments.',
-                "children": [],  # Function calls will be populated on demand
-                "code": "def config_parser():\n    # Function code here"  # Store code for later extraction
-            },
-            {
-                "summary": 'Train neural radiance field model',
-                "original": 'train',
-                "description": 'The function loads LLFF dataset, processes poses and images, initializes a neural radiance field model, and trains it with optical flow and depth supervision. It handles various rendering modes (bullet time, slow motion), implements loss functions for scene flow and rendering, and periodically saves checkpoints and validation results. The training loop includes learning rate decay, hard mining for motion regions, and multi-stage optimization with different loss weights.',
-                "children": [],  # Function calls will be populated on demand
-                "code": "def train():\n    # Function code here"  # Store code for later extraction
-            }]
-        return hierarchy
+        return [dict(item) for item in SAMPLE_HIERARCHY], None
     
     # Check if the file exists before attempting to parse it
     if not os.path.isfile(entry_path):
         app.logger.error(f"Entry file does not exist: {entry_path}")
-        hierarchy.append({
-            "summary": "Error",
-            "original": "error",
-            "description": f"Entry file {entry_file} not found in repository",
-            "children": [],
-            "code": ""
-        })
-        
         # Update progress to complete with error
-        if repo_id:
-            progress_data[repo_id]['status'] = 'complete'
-            progress_data[repo_id]['progress'] = 100
-            
-        return hierarchy
+        complete_progress(repo_id)
+        return [error_item(f"Entry file {entry_file} not found in repository")], None
     
     # parse entry functions
     try:
         functions = parse_functions(entry_path)
-        total_functions = len(functions)
-        
-        # Update total functions count
-        if repo_id:
-            progress_data[repo_id]['total_functions'] = total_functions
-            
-        for i, func in enumerate(functions):
-            try:
-                # Update progress
-                if repo_id:
-                    progress_data[repo_id]['current_function'] = func['original_name']
-                    progress_data[repo_id]['current_index'] = i + 1
-                    progress_data[repo_id]['progress'] = int((i / total_functions) * 100)
-                
-                summary_response = generate_function_summary(func)
-                
-                # Parse the JSON from the response
-                if isinstance(summary_response, str):
-                    summary_data = json.loads(summary_response)
-                else:
-                    summary_data = summary_response
-                
-                hierarchy.append({
-                    "summary": summary_data.get('summary', func['original_name']),
-                    "original": func['original_name'],
-                    "description": summary_data.get('description', 'No description available'),
-                    "children": [],  # Will be populated on demand
-                    "code": func['code']  # Store the code for later use
-                })
-                
-            except Exception as e:
-                app.logger.error(f"Error processing function {func['original_name']}: {str(e)}")
-                # Add a basic entry if summarization fails
-                hierarchy.append({
-                    "summary": func['original_name'],
-                    "original": func['original_name'],
-                    "description": "Function summary unavailable",
-                    "children": [],
-                    "code": func['code']
-                })
-                
     except Exception as e:
         app.logger.error(f"Error parsing entry file {entry_path}: {str(e)}")
+        complete_progress(repo_id)
         # Add an error entry to the hierarchy
-        hierarchy.append({
-            "summary": "Error",
-            "original": "error",
-            "description": f"Could not analyze entry file: {str(e)}",
-            "children": [],
-            "code": ""
-        })
+        return [error_item(f"Could not analyze entry file: {str(e)}")], None
     
-    # Mark progress as complete
+    # Update total functions count
     if repo_id:
-        progress_data[repo_id]['status'] = 'complete'
-        progress_data[repo_id]['progress'] = 100
+        progress_data.update(repo_id, total_functions=len(functions))
+    return None, functions
+
+def group_by_fingerprint(functions):
+    """Group identical bodies so each is only summarized once"""
+    groups = {}
+    for func in functions:
+        groups.setdefault(func['fingerprint'], []).append(func)
+    return groups
+
+def assemble_hierarchy(functions, groups, summaries, repo_id):
+    """Build hierarchy items from one summary (or exception) per fingerprint"""
+    hierarchy = []
+    for func in functions:
+        source_name = groups[func['fingerprint']][0]['original_name']
+        summary_data = summaries[func['fingerprint']]
+        if isinstance(summary_data, Exception):
+            app.logger.error(f"Error processing function {func['original_name']}: {str(summary_data)}")
+            # Add a basic entry if summarization fails
+            hierarchy.append(hierarchy_item(func, {"description": "Function summary unavailable"}))
+        elif source_name == func['original_name']:
+            hierarchy.append(hierarchy_item(func, summary_data))
+        else:
+            hierarchy.append(hierarchy_item(func, duplicate_summary(source_name, summary_data, func)))
     
+    # Mark progress as complete
+    complete_progress(repo_id)
     return hierarchy
 
-@app.route("/")
-def entry():
-    return render_template("entry.html")
+def build_hierarchy(repo_dir, repo_url=None):
+    # Track progress for this repository
+    repo_id = start_progress(repo_url)
+    
+    # Get entry file from README analysis
+    entry_file = DEFAULT_ENTRY_FILE
+    if SKIP_PROCESSING_LVL < 1:
+        entry_file = select_entry_file(analyze_readme(repo_dir))
+    
+    hierarchy, functions = load_entry_functions(repo_dir, entry_file, repo_id)
+    if hierarchy is not None:
+        return hierarchy
+    
+    groups = group_by_fingerprint(functions)
+    summaries = {}
+    completed = 0
+    for fingerprint, group in groups.items():
+        update_summary_progress(repo_id, group[0]['original_name'], completed + 1,
+                                completed, len(functions))
+        try:
+            summaries[fingerprint] = generate_function_summary(group[0])
+        except Exception as e:
+            summaries[fingerprint] = e
+        completed += len(group)
+    
+    return assemble_hierarchy(functions, groups, summaries, repo_id)
 
-@app.route("/analyze", methods=["POST"])
-def analyze_repo():
+# Request handlers take the request JSON and return the response body. They
+# are shared by the Flask routes below and the async routes in async_app.py,
+# so both serving modes keep the same request/response contract.
+
+def error_response(e, action):
+    """Map an exception to an error body and status code"""
+    if isinstance(e, ApiError):
+        return {"status": "error", "message": str(e)}, e.status_code
+    app.logger.error(f"Error {action}: {str(e)}")
+    return {"status": "error", "message": str(e)}, 500
+
+def handle_api_request(handler, data, action):
+    """Run a request handler, returning (response body, status code)"""
     try:
-        repo_url = request.json.get('repo_url')
-        if not repo_url:
-            return jsonify({
-                "status": "error",
-                "message": "Repository URL is required"
-            }), 400
-            
-        repo_path = clone_or_update_repo(repo_url)
-        hierarchy = build_hierarchy(repo_path, repo_url)
-        
-        # Store hierarchy in session
-        session['hierarchy'] = hierarchy
-        
-        return jsonify({
-            "status": "success",
-            "repo_id": generate_repo_id(repo_url),
-            "hierarchy": hierarchy
-        })
+        return handler(data or {}), 200
     except Exception as e:
-        app.logger.error(f"Error analyzing repository: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+        return error_response(e, action)
 
-@app.route("/get_function_calls", methods=["POST"])
-def get_function_calls():
-    try:
-        function_code = request.json.get('function_code')
-        function_name = request.json.get('function_name', 'Unknown Function')
-        
-        if not function_code:
-            return jsonify({
-                "status": "error",
-                "message": "Function code is required"
-            }), 400
-            
-        # Extract function calls from the provided code
-        function_calls = extract_function_calls(function_code)
-        
-        # Create child items for each function call
-        children = []
-        for call in function_calls:
-            children.append({
-                "summary": call,
-                "original": call,
-                "description": f"Function call from {function_name}",
-                "children": [],
-                "is_call": True
-            })
+def require_repo_url(data):
+    repo_url = data.get('repo_url')
+    if not repo_url:
+        raise BadRequest("Repository URL is required")
+    return repo_url
+
+def finish_analysis(repo_url, hierarchy):
+    """Re-index the repository and build the /analyze response"""
+    repo_summaries.set(generate_repo_id(repo_url), {
+        item['original']: f"{item['summary']} {item['description']}" for item in hierarchy
+    })
+    
+    # Re-index after every pull so search reflects the latest code
+    project_index = get_project_index(repo_url, refresh=True)
+    
+    return {
+        "status": "success",
+        "repo_id": generate_repo_id(repo_url),
+        "hierarchy": hierarchy,
+        "duplicate_groups": project_index['duplicate_groups']
+    }
+
+def function_calls_response(data):
+    function_code = data.get('function_code')
+    function_name = data.get('function_name', 'Unknown Function')
+    
+    if not function_code:
+        raise BadRequest("Function code is required")
         
-        return jsonify({
-            "status": "success",
-            "function_calls": function_calls,
-            "children": children
+    # Extract function calls from the provided code
+    function_calls = extract_function_calls(function_code)
+    
+    # Create child items for each function call
+    children = []
+    for call in function_calls:
+        children.append({
+            "summary": call,
+            "original": call,
+            "description": f"Function call from {function_name}",
+            "children": [],
+            "is_call": True
         })
-    except Exception as e:
-        app.logger.error(f"Error extracting function calls: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
-        
-                
-@app.route("/progress", methods=["POST"])
-def check_progress():
-    repo_url = request.json.get('repo_url')
-    repo_id = generate_repo_id(repo_url)
+    
+    return {
+        "status": "success",
+        "function_calls": function_calls,
+        "children": children
+    }
+
+def progress_response(data):
+    repo_id = generate_repo_id(data.get('repo_url'))
     
     # Get progress data for this repository
-    repo_progress = progress_data.get(repo_id, {
+    return progress_data.get(repo_id, {
         'status': 'initializing',
         'progress': 0,
         'current_function': '',
         'current_index': 0,
         'total_functions': 0
     })
+
+def search_response(data):
+    repo_url = require_repo_url(data)
+    query = data.get('query', '')
+    limit = int_param(data, 'limit', 20, 1, 200)
+    
+    search_index = get_project_index(repo_url)['search_index']
+    matches = search_index.search(
+        query,
+        limit=limit,
+        include_summaries=bool(data.get('include_summaries', False))
+    )
     
-    return jsonify(repo_progress)
+    return {
+        "status": "success",
+        "query": query,
+        "matches": matches
+    }
 
-@app.route("/results")
-def show_results():
-    # Get hierarchy from session or provide empty list if not found
-    hierarchy_data = session.get('hierarchy', [])
-    return render_template("index.html", hierarchy=hierarchy_data)
+def call_tree_response(data):
+    repo_url = data.get('repo_url')
+    function_name = data.get('function_name')
+    if not repo_url or not function_name:
+        raise BadRequest("Repository URL and function name are required")
+    
+    max_depth = int_param(data, 'max_depth', 3, 1, 10)
+    
+    index = get_project_index(repo_url)
+    call_tree = build_call_tree_from_index(index, function_name, max_depth)
+    if call_tree is None:
+        raise ApiError(f"Function {function_name} not found in call graph", 404)
+    
+    return {
+        "status": "success",
+        "call_tree": call_tree
+    }
 
+def metrics_response(data):
+    repo_url = require_repo_url(data)
+    sort_by = data.get('sort_by', 'fan_in')
+    if sort_by not in METRIC_FIELDS:
+        raise BadRequest(f"sort_by must be one of {', '.join(METRIC_FIELDS)}")
+    
+    page_number = int_param(data, 'page', 1, 1, 1000000)
+    per_page = int_param(data, 'per_page', 50, 1, 500)
+    
+    page = get_metrics_page(
+        get_project_index(repo_url),
+        sort_by=sort_by,
+        descending=data.get('order', 'desc') != 'asc',
+        page=page_number,
+        per_page=per_page
+    )
+    
+    return {
+        "status": "success",
+        "sort_by": sort_by,
+        **page
+    }
 
-@app.route("/repos", methods=["GET"])
-def list_repos():
+def repos_response(data):
     repo_dir = os.path.join(os.getcwd(), "repos")
-    return jsonify({
+    return {
         "repositories": [
             {"id": d, "path": os.path.join(repo_dir, d)}
             for d in os.listdir(repo_dir)
             if os.path.isdir(os.path.join(repo_dir, d))
         ]
-    })
+    }
+
+def llm_stats_response(data):
+    return llm.stats.snapshot()
+
+def api_response(handler, action):
+    body, status = handle_api_request(handler, request.get_json(silent=True), action)
+    return jsonify(body), status
+
+@app.route("/")
+def entry():
+    return render_template("entry.html")
+
+@app.route("/analyze", methods=["POST"])
+def analyze_repo():
+    try:
+        repo_url = require_repo_url(request.get_json(silent=True) or {})
+        repo_path = clone_or_update_repo(repo_url)
+        hierarchy = build_hierarchy(repo_path, repo_url)
+        body = finish_analysis(repo_url, hierarchy)
+    except Exception as e:
+        body, status = error_response(e, "analyzing repository")
+        return jsonify(body), status
+    
+    # Store hierarchy in session
+    session['hierarchy'] = hierarchy
+    session['repo_url'] = repo_url
+    return jsonify(body)
+
+@app.route("/get_function_calls", methods=["POST"])
+def get_function_calls():
+    return api_response(function_calls_response, "extracting function calls")
+
+@app.route("/progress", methods=["POST"])
+def check_progress():
+    return api_response(progress_response, "checking progress")
+
+@app.route("/search", methods=["POST"])
+def search_functions():
+    return api_response(search_response, "searching functions")
+
+@app.route("/call_tree", methods=["POST"])
+def get_call_tree():
+    return api_response(call_tree_response, "building call tree")
+
+@app.route("/metrics", methods=["POST"])
+def get_function_metrics():
+    return api_response(metrics_response, "getting function metrics")
+
+@app.route("/llm_stats", methods=["GET"])
+def llm_stats():
+    return api_response(llm_stats_response, "getting LLM stats")
+
+@app.route("/results")
+def show_results():
+    # Get hierarchy from session or provide empty list if not found
+    hierarchy_data = session.get('hierarchy', [])
+    return render_template("index.html", hierarchy=hierarchy_data,
+                           repo_url=session.get('repo_url', ''))
+
+
+@app.route("/repos", methods=["GET"])
+def list_repos():
+    return api_response(repos_response, "listing repositories")
     
 if __name__ == "__main__":
-    app.run(host='0.0.0.0',debug=True,port=6001)
\ No newline at end of file
+    app.run(host='0.0.0.0',debug=True,port=6001)
@@ -1,8 +1,13 @@
 import ast as std_ast
+import bisect
+import hashlib
 import json
+import logging
 import os
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
 
 class CallTreeBuilder(std_ast.NodeVisitor):
     def __init__(self, current_module, file_path):
@@ -143,20 +148,24 @@ class CallTreeBuilder(std_ast.NodeVisitor):
             
         return None, False
 
-def extract_code_segments(file_path, function_name, call_positions):
-    """Extract code segments between function calls"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+def extract_code_segments(file_path, function_name, call_positions, lines=None, function_node=None):
+    """
+    Extract code segments between function calls. Callers that already parsed
+    the file can pass its lines and the function node to skip re-parsing.
+    """
+    if lines is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
     
     # Get function definition bounds
-    with open(file_path, 'r', encoding='utf-8') as f:
-        tree = std_ast.parse(f.read())
-    
-    function_node = None
-    for node in std_ast.walk(tree):
-        if isinstance(node, std_ast.FunctionDef) and node.name == function_name:
-            function_node = node
-            break
+    if function_node is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            tree = std_ast.parse(f.read())
+        
+        for node in std_ast.walk(tree):
+            if isinstance(node, std_ast.FunctionDef) and node.name == function_name:
+                function_node = node
+                break
     
     if not function_node:
         return []
@@ -206,26 +215,340 @@ def extract_code_segments(file_path, function_name, call_positions):
     
     return segments
 
-def build_call_tree(project_root, entry_file, entry_function, max_depth):
-    # Convert paths to absolute
+def function_fingerprint(node):
+    """Hash a function's AST, ignoring its name, docstring, comments and whitespace"""
+    body = node.body
+    if (body and isinstance(body[0], std_ast.Expr) and
+            isinstance(body[0].value, std_ast.Constant) and
+            isinstance(body[0].value.value, str)):
+        body = body[1:]
+    
+    # ast.dump omits line numbers by default, so formatting does not matter
+    parts = [std_ast.dump(node.args)]
+    parts.extend(std_ast.dump(decorator) for decorator in node.decorator_list)
+    parts.append(std_ast.dump(node.returns) if node.returns else '')
+    parts.extend(std_ast.dump(stmt) for stmt in body)
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
+
+def fan_out_segments(segments, calls):
+    """Reuse an identical body's code segments with this function's own call sites"""
+    calls = sorted(calls, key=lambda x: x['lineno'])
+    call_segments = [segment for segment in segments if segment['type'] == 'call']
+    if len(call_segments) != len(calls):
+        return None
+    
+    calls = iter(calls)
+    result = []
+    for segment in segments:
+        if segment['type'] == 'call':
+            call = next(calls)
+            segment = {
+                'type': 'call',
+                'content': call['source'],
+                'callee': call['name'],
+                'ast_id': call['ast_id']
+            }
+        result.append(segment)
+    return result
+
+class FunctionSearchIndex:
+    """Trigram and prefix index over qualified function names and summaries"""
+    def __init__(self):
+        self.entries = []  # Entry dicts by document id
+        self.ids = {}  # Map of qualified name to document id
+        self.name_trigrams = defaultdict(set)
+        self.summary_trigrams = defaultdict(set)
+        self.prefixes = []  # (lowercase simple name, document id) pairs, sorted by index_project
+
+    @staticmethod
+    def _trigrams(text, pad=True):
+        """Get the set of trigrams in a lowercased string"""
+        text = text.lower()
+        if pad:
+            # Padding lets short names and word boundaries produce trigrams
+            text = f"  {text} "
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, qual_name, file_path=None, line_range=None, summary=None):
+        if qual_name in self.ids:
+            doc_id = self.ids[qual_name]
+        else:
+            doc_id = len(self.entries)
+            self.ids[qual_name] = doc_id
+            simple_name = qual_name.split('.')[-1]
+            self.entries.append({
+                'name': qual_name,
+                'simple_name': simple_name,
+                'file': str(file_path) if file_path else None,
+                'line_range': line_range,
+                'summary': None
+            })
+            for trigram in self._trigrams(qual_name):
+                self.name_trigrams[trigram].add(doc_id)
+            self.prefixes.append((simple_name.lower(), doc_id))
+
+        if summary:
+            self._index_summary(doc_id, summary)
+        return doc_id
+
+    def set_summary(self, name, summary):
+        """Attach a summary by qualified name, or by simple name if it is unique"""
+        doc_id = self.ids.get(name)
+        if doc_id is None:
+            matches = [entry_id for entry_id, entry in enumerate(self.entries)
+                       if entry['simple_name'] == name]
+            if len(matches) != 1:
+                return False
+            doc_id = matches[0]
+        self._index_summary(doc_id, summary)
+        return True
+
+    def _index_summary(self, doc_id, summary):
+        self.entries[doc_id]['summary'] = summary
+        for trigram in self._trigrams(summary):
+            self.summary_trigrams[trigram].add(doc_id)
+
+    def _prefix_matches(self, prefix):
+        """Get document ids whose simple name starts with prefix"""
+        start = bisect.bisect_left(self.prefixes, (prefix,))
+        matches = []
+        for simple_name, doc_id in self.prefixes[start:]:
+            if not simple_name.startswith(prefix):
+                break
+            matches.append(doc_id)
+        return matches
+
+    def _score(self, entry, query, overlap):
+        """Rank exact names above prefixes, substrings and fuzzy matches"""
+        simple_name = entry['simple_name'].lower()
+        if simple_name == query:
+            return 4.0
+        if simple_name.startswith(query):
+            return 3.0 + len(query) / len(simple_name)
+        if query in entry['name'].lower():
+            return 2.0
+        return overlap
+
+    def search(self, query, limit=20, include_summaries=False):
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        scores = {}
+        if len(query) < 3:
+            # Too short for trigrams, fall back to the prefix index
+            for doc_id in self._prefix_matches(query):
+                scores[doc_id] = self._score(self.entries[doc_id], query, 0.0)
+        else:
+            query_trigrams = self._trigrams(query, pad=False)
+            hits = defaultdict(int)
+            for trigram in query_trigrams:
+                for doc_id in self.name_trigrams.get(trigram, ()):
+                    hits[doc_id] += 1
+            for doc_id, count in hits.items():
+                overlap = count / len(query_trigrams)
+                # Require half the trigrams to keep fuzzy matches relevant
+                if overlap >= 0.5:
+                    scores[doc_id] = self._score(self.entries[doc_id], query, overlap)
+
+            if include_summaries:
+                hits = defaultdict(int)
+                for trigram in query_trigrams:
+                    for doc_id in self.summary_trigrams.get(trigram, ()):
+                        hits[doc_id] += 1
+                for doc_id, count in hits.items():
+                    summary = self.entries[doc_id]['summary'] or ''
+                    if count == len(query_trigrams) and query in summary.lower():
+                        # Summary matches rank below any name match
+                        scores.setdefault(doc_id, 0.4)
+
+        ranked = sorted(scores.items(),
+                        key=lambda item: (-item[1], len(self.entries[item[0]]['name'])))
+        results = []
+        for doc_id, score in ranked[:limit]:
+            result = dict(self.entries[doc_id])
+            result['score'] = round(score, 3)
+            results.append(result)
+        return results
+
+METRIC_FIELDS = ('fan_in', 'fan_out', 'reachable', 'call_depth', 'lines')
+
+def _strongly_connected_components(adjacency):
+    """Iterative Tarjan's algorithm, yields components in reverse topological order"""
+    count = len(adjacency)
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack = []
+    components = []
+    counter = 0
+    
+    for root in range(count):
+        if order[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, edge_index = work.pop()
+            if edge_index == 0:
+                order[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+            
+            descended = False
+            for i in range(edge_index, len(adjacency[node])):
+                callee = adjacency[node][i]
+                if order[callee] == -1:
+                    # Resume this node after the callee is finished
+                    work.append((node, i + 1))
+                    work.append((callee, 0))
+                    descended = True
+                    break
+                elif on_stack[callee]:
+                    low[node] = min(low[node], order[callee])
+            if descended:
+                continue
+            
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+    return components
+
+def compute_function_metrics(call_graph, line_ranges):
+    """
+    Compute fan-in, fan-out, reachable-set size, longest call chain and line
+    count for every function in one pass over the condensed call graph.
+    Functions in a recursive cycle share reachable set and chain length.
+    """
+    names = list(line_ranges)
+    ids = {name: i for i, name in enumerate(names)}
+    
+    # Distinct resolved callees per function
+    adjacency = []
+    for name in names:
+        callees = {ids[call['name']] for call in call_graph.get(name, []) if call['name'] in ids}
+        adjacency.append(sorted(callees))
+    
+    fan_in = [0] * len(names)
+    for callees in adjacency:
+        for callee in callees:
+            fan_in[callee] += 1
+    
+    components = _strongly_connected_components(adjacency)
+    component_of = [0] * len(names)
+    for component_id, component in enumerate(components):
+        for member in component:
+            component_of[member] = component_id
+    
+    # Distinct callee components, and how many components still need each one's bitset
+    callee_components = []
+    pending_callers = [0] * len(components)
+    for component_id, component in enumerate(components):
+        callees = {component_of[callee] for member in component for callee in adjacency[member]}
+        callees.discard(component_id)
+        callee_components.append(callees)
+        for callee_component in callees:
+            pending_callers[callee_component] += 1
+    
+    # Components arrive callees-first, so every successor is already final.
+    # Bits are handed out only to components that something calls, in this
+    # order, and each bitset is dropped once its last caller has used it, so
+    # sparse graphs stay linear instead of every set being len(names) wide.
+    reachable_bits = [0] * len(components)
+    reachable = [0] * len(components)
+    call_depth = [0] * len(components)
+    recursive = [False] * len(components)
+    next_bit = 0
+    for component_id, component in enumerate(components):
+        bits = 0
+        depth = 0
+        for callee_component in callee_components[component_id]:
+            bits |= reachable_bits[callee_component]
+            depth = max(depth, call_depth[callee_component] + 1)
+            pending_callers[callee_component] -= 1
+            if not pending_callers[callee_component]:
+                reachable_bits[callee_component] = 0
+        
+        reachable[component_id] = bits.bit_count() + len(component)
+        call_depth[component_id] = depth
+        recursive[component_id] = len(component) > 1 or component[0] in adjacency[component[0]]
+        if pending_callers[component_id]:
+            reachable_bits[component_id] = bits | ((1 << len(component)) - 1) << next_bit
+            next_bit += len(component)
+    
+    metrics = {}
+    for i, name in enumerate(names):
+        component_id = component_of[i]
+        line_range = line_ranges[name]
+        metrics[name] = {
+            'name': name,
+            'fan_in': fan_in[i],
+            'fan_out': len(adjacency[i]),
+            # Exclude the function itself unless it can call back into itself
+            'reachable': reachable[component_id] - (0 if recursive[component_id] else 1),
+            'call_depth': call_depth[component_id],
+            'lines': line_range[1] - line_range[0] + 1 if line_range else 0,
+            'recursive': recursive[component_id]
+        }
+    return metrics
+
+def get_metrics_page(index, sort_by='fan_in', descending=True, page=1, per_page=50):
+    """Get one page of functions ranked by a metric, caching each ranking"""
+    rankings = index['metric_rankings']
+    if (sort_by, descending) not in rankings:
+        rankings[(sort_by, descending)] = sorted(
+            index['metrics'].values(),
+            key=lambda item: (-item[sort_by] if descending else item[sort_by], item['name'])
+        )
+    ranking = rankings[(sort_by, descending)]
+    start = (page - 1) * per_page
+    return {
+        'total': len(ranking),
+        'page': page,
+        'per_page': per_page,
+        'functions': ranking[start:start + per_page]
+    }
+
+def get_module_name(project_root, py_file):
+    """Get the dotted module name of a file relative to the project root"""
+    relative_path = Path(py_file).relative_to(project_root)
+    if relative_path.name == '__init__.py':
+        return '.'.join(relative_path.parent.parts)
+    return '.'.join(relative_path.with_suffix('').parts)
+
+def index_project(project_root):
+    """Build the call graph, code segments and search index for a project"""
     project_root = os.path.abspath(project_root)
-    entry_file = os.path.abspath(entry_file)
     
     # Build call graph and extract function code segments
     call_graph = defaultdict(list)
     function_segments = {}
+    search_index = FunctionSearchIndex()
+    
+    # Line range of every function, None for __main__ blocks
+    line_ranges = {}
+    
+    # Functions grouped by fingerprint to report duplicates
+    fingerprint_groups = defaultdict(list)
+    
+    # First function with each exact body text, whose segments the rest reuse
+    shared_segments = {}
     
     # Map of module names to file paths
     module_files = {}
     
     for py_file in Path(project_root).rglob('*.py'):
         # Get module name from file path
-        relative_path = py_file.relative_to(project_root)
-        if py_file.name == '__init__.py':
-            module_name = '.'.join(relative_path.parent.parts)
-        else:
-            module_name = '.'.join(relative_path.with_suffix('').parts)
-        
+        module_name = get_module_name(project_root, py_file)
         module_files[module_name] = py_file
             
         with open(py_file, 'r', encoding='utf-8') as f:
@@ -244,15 +567,125 @@ def build_call_tree(project_root, entry_file, entry_function, max_depth):
                 for func_name, calls in builder.call_graph.items():
                     # Skip __main__ blocks for now
                     if not func_name.endswith('__main__'):
-                        # Extract the function name without module
-                        simple_name = func_name.split('.')[-1]
-                        function_segments[func_name] = extract_code_segments(
-                            py_file, simple_name, calls
-                        )
+                        fingerprint = function_fingerprint(builder.ast_map[func_name]['node'])
+                        fingerprint_groups[fingerprint].append(func_name)
+                        
+                        # Segment text must be this function's own, so only share
+                        # segments when the source after the def line is byte-identical
+                        start_line, end_line = builder.ast_map[func_name]['line_range']
+                        source_key = (fingerprint, ''.join(builder.source_lines[start_line:end_line]))
+                        
+                        segments = None
+                        if source_key in shared_segments:
+                            segments = fan_out_segments(
+                                function_segments[shared_segments[source_key]], calls
+                            )
+                        else:
+                            shared_segments[source_key] = func_name
+                        if segments is None:
+                            # Extract the function name without module
+                            simple_name = func_name.split('.')[-1]
+                            segments = extract_code_segments(
+                                py_file, simple_name, calls,
+                                lines=builder.source_lines,
+                                function_node=builder.ast_map[func_name]['node']
+                            )
+                        function_segments[func_name] = segments
+                        line_ranges[func_name] = builder.ast_map[func_name]['line_range']
+                        search_index.add(func_name, py_file, line_ranges[func_name])
+                    elif calls:
+                        line_ranges[func_name] = None
+                        search_index.add(func_name, py_file)
                 
             except Exception as e:
                 print(f"Error parsing {py_file}: {e}")
     
+    # Sort once here so concurrent searches never see a list mid-sort
+    search_index.prefixes.sort()
+    
+    duplicate_groups = [
+        {'fingerprint': fingerprint, 'functions': names}
+        for fingerprint, names in fingerprint_groups.items()
+        if len(names) > 1
+    ]
+    
+    return {
+        'project_root': project_root,
+        'call_graph': call_graph,
+        'function_segments': function_segments,
+        'module_files': module_files,
+        'search_index': search_index,
+        'duplicate_groups': duplicate_groups,
+        'metrics': compute_function_metrics(call_graph, line_ranges),
+        'metric_rankings': {}  # Sorted metrics by (sort key, descending), filled lazily
+    }
+
+def build_call_tree_from_index(index, entry_point, max_depth, max_nodes=1000):
+    """
+    Build the call tree rooted at a qualified function name.
+
+    Each function is expanded once, at its shallowest depth. Later calls to
+    it are marked "ref" and have no children, so the tree grows with the size
+    of the call graph rather than exponentially with depth. At most max_nodes
+    nodes are returned; the root is marked "truncated" when that cap is hit.
+    Only the root carries its code segments.
+    """
+    call_graph = index['call_graph']
+    function_segments = index['function_segments']
+    
+    # Check if entry point exists in call graph
+    if entry_point not in call_graph and entry_point not in function_segments:
+        logger.warning(f"Entry point {entry_point} not found in call graph ({len(call_graph)} functions)")
+        return None
+    
+    root = {
+        "name": entry_point.split('.')[-1],  # Just the function name
+        "original": entry_point,  # Full qualified name
+        "children": []
+    }
+    if entry_point in function_segments:
+        root["segments"] = function_segments[entry_point]
+    
+    # Breadth first, so each function is expanded at its shallowest depth
+    expanded = {entry_point}
+    queue = deque([(root, 1)])
+    node_count = 1
+    while queue:
+        node, depth = queue.popleft()
+        if depth >= max_depth:
+            continue
+        
+        for call in call_graph.get(node["original"], []):
+            if node_count >= max_nodes:
+                root["truncated"] = True
+                return root
+            
+            callee_name = call['name']
+            child_node = {
+                "name": callee_name.split('.')[-1],
+                "original": callee_name,
+                "ast_id": call['ast_id'],
+                "call_line": call['source'],
+                "children": []
+            }
+            node["children"].append(child_node)
+            node_count += 1
+            
+            if callee_name in expanded:
+                child_node["ref"] = True
+            elif callee_name in call_graph:
+                expanded.add(callee_name)
+                queue.append((child_node, depth + 1))
+    
+    return root
+
+def build_call_tree(project_root, entry_file, entry_function, max_depth):
+    # Convert paths to absolute
+    project_root = os.path.abspath(project_root)
+    entry_file = os.path.abspath(entry_file)
+    
+    index = index_project(project_root)
+    
     # Handle __main__ entry point
     entry_point = None
     if entry_function == "__main__":
@@ -260,72 +693,10 @@ def build_call_tree(project_root, entry_file, entry_function, max_depth):
         entry_point = f"{'.'.join(entry_path.parts)}.__main__"
     else:
         # Extract module name from entry file
-        entry_path = Path(entry_file).relative_to(project_root)
-        if entry_path.name == '__init__.py':
-            module_name = '.'.join(entry_path.parent.parts)
-        else:
-            module_name = '.'.join(entry_path.with_suffix('').parts)
-        
+        module_name = get_module_name(project_root, entry_file)
         entry_point = f"{module_name}.{entry_function}"
     
-    # Check if entry point exists in call graph
-    if entry_point not in call_graph:
-        print(f"Warning: Entry point {entry_point} not found in call graph.")
-        print("Available entry points:")
-        for key in call_graph.keys():
-            print(f"  - {key}")
-        return None
-    
-    # Build the call tree
-    def _recurse(current_func, depth, visited):
-        if depth > max_depth or current_func in visited:
-            return None
-        
-        # Split the function name to get just the function part
-        module_parts = current_func.split('.')
-        func_name = module_parts[-1]
-        
-        node = {
-            "name": func_name,  # Just the function name
-            "original": current_func,  # Full qualified name
-            "children": []
-        }
-        
-        # Add code segments if available
-        if current_func in function_segments:
-            node["segments"] = function_segments[current_func]
-        
-        if depth < max_depth:
-            visited.add(current_func)
-            
-            # Add child function calls
-            for call in call_graph.get(current_func, []):
-                callee_name = call['name']
-                
-                # Create child node for the function call
-                child_node = {
-                    "name": callee_name.split('.')[-1],  # Just the function name
-                    "original": callee_name,  # Full qualified name
-                    "ast_id": call['ast_id'],
-                    "call_line": call['source'],
-                    "children": []
-                }
-                
-                # Recursively process this child if it's in our call graph
-                child_result = _recurse(callee_name, depth + 1, visited.copy())
-                if child_result:
-                    # Merge attributes from recursive result
-                    for key, value in child_result.items():
-                        if key != "name" and key != "original":  # Keep our name and original
-                            child_node[key] = value
-                
-                node["children"].append(child_node)
-                        
-        return node
-    
-    # Start from entry point
-    result = _recurse(entry_point, 1, set())
-    return result
+    return build_call_tree_from_index(index, entry_point, max_depth)
 
 # # Complete runnable example
 # if __name__ == "__main__":
@@ -347,4 +718,63 @@ def build_call_tree(project_root, entry_file, entry_function, max_depth):
 #         max_depth=max_depth
 #     )
     
-#     print(json.dumps(call_tree, indent=2))
\ No newline at end of file
+#     print(json.dumps(call_tree, indent=2))
+if __name__ == "__main__":
+    # Check compute_function_metrics against brute force on random call
+    # graphs, then time it on large sparse graphs
+    import random, time
+    
+    def brute_force_metrics(call_graph, names):
+        reach = {}
+        for name in names:
+            seen = set()
+            stack = [call['name'] for call in call_graph[name]]
+            while stack:
+                callee = stack.pop()
+                if callee not in seen:
+                    seen.add(callee)
+                    stack.extend(call['name'] for call in call_graph[callee])
+            reach[name] = seen
+        
+        # Longest chain of calls between distinct components
+        depth_cache = {}
+        def depth(name):
+            if name not in depth_cache:
+                component = {other for other in reach[name] if name in reach[other]} | {name}
+                depth_cache[name] = max(
+                    (depth(callee) + 1 for callee in reach[name] if callee not in component),
+                    default=0
+                )
+            return depth_cache[name]
+        
+        return {
+            name: {'reachable': len(reach[name]), 'recursive': name in reach[name], 'call_depth': depth(name)}
+            for name in names
+        }
+    
+    random.seed(0)
+    for trial in range(200):
+        names = [f"m.f{i}" for i in range(random.randint(1, 30))]
+        edge_count = random.randint(0, len(names) * 3)
+        call_graph = {name: [] for name in names}
+        for _ in range(edge_count):
+            call_graph[random.choice(names)].append({'name': random.choice(names)})
+        line_ranges = {name: (1, 1) for name in names}
+        
+        metrics = compute_function_metrics(call_graph, line_ranges)
+        expected = brute_force_metrics(call_graph, names)
+        for name in names:
+            for field, value in expected[name].items():
+                assert metrics[name][field] == value, (trial, name, field, metrics[name][field], value)
+    print("Metrics match brute force on 200 random call graphs")
+    
+    for label, size, make_calls in (
+        ("no calls", 40000, lambda i: []),
+        ("call chain", 200000, lambda i: [{'name': f"m.f{i + 1}"}] if i + 1 < 200000 else []),
+    ):
+        call_graph = {f"m.f{i}": make_calls(i) for i in range(size)}
+        line_ranges = {name: (1, 1) for name in call_graph}
+        start = time.perf_counter()
+        metrics = compute_function_metrics(call_graph, line_ranges)
+        print(f"{label}: {size} functions in {time.perf_counter() - start:.2f}s, "
+              f"max reachable {max(item['reachable'] for item in metrics.values())}")
@@ -0,0 +1,171 @@
+"""
+Async serving mode for the analyzer.
+
+Serves the same routes as app.py from an ASGI app so that slow analyses do
+not tie up worker threads: LLM calls go through the shared LLMClient's async
+path, git, parsing and indexing run in a bounded worker pool, and cheap
+handlers such as /progress answer directly on the event loop. Request
+handling and hierarchy assembly are shared with app.py; only the I/O
+differs.
+
+Run with `hypercorn async_app:app` or `python async_app.py`.
+"""
+import os, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, render_template, request, jsonify, session
+
+import app as core
+
+app = Quart(__name__)
+app.secret_key = core.app.secret_key
+
+# Concurrent LLM requests per analysis
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+# Git, parsing and indexing get their own bounded pool, so a few slow clones
+# or index builds queue among themselves instead of filling the loop's
+# default executor
+blocking_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BLOCKING_WORKERS", "4")), thread_name_prefix="blocking"
+)
+
+@app.after_serving
+async def close_llm_client():
+    await core.llm.aclose()
+    blocking_executor.shutdown(wait=False)
+
+async def run_blocking(func, *args):
+    """Run slow synchronous work (git, parsing, indexing) off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor, func, *args)
+
+async def analyze_readme(repo_dir):
+    readme_path = os.path.join(repo_dir, "README.md")
+
+    try:
+        with open(readme_path, "r") as f:
+            readme_content = f.read()
+    except FileNotFoundError:
+        return "No README found"
+
+    try:
+        response_json = await core.llm.achat(
+            core.build_readme_prompt(readme_content), max_tokens=500, timeout=30
+        )
+        return core.parse_llm_content(response_json)
+
+    except Exception as e:
+        app.logger.error(f"API Call Failed: {str(e)}")
+        return "Analysis failed"
+
+async def generate_function_summary(function):
+    try:
+        response_json = await core.llm.achat(core.build_summary_prompt(function), max_tokens=500)
+        return core.parse_llm_content(response_json)
+
+    except Exception as e:
+        app.logger.error(f"Error generating function summary: {str(e)}")
+        return core.fallback_summary(function)
+
+async def build_hierarchy(repo_dir, repo_url=None):
+    """Async counterpart of app.build_hierarchy that summarizes concurrently"""
+    # Track progress for this repository
+    repo_id = core.start_progress(repo_url)
+
+    # Get entry file from README analysis
+    entry_file = core.DEFAULT_ENTRY_FILE
+    if core.SKIP_PROCESSING_LVL < 1:
+        entry_file = core.select_entry_file(await analyze_readme(repo_dir))
+
+    hierarchy, functions = await run_blocking(core.load_entry_functions, repo_dir, entry_file, repo_id)
+    if hierarchy is not None:
+        return hierarchy
+
+    groups = core.group_by_fingerprint(functions)
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    completed = 0
+
+    async def summarize(group):
+        nonlocal completed
+        async with semaphore:
+            summary_data = await generate_function_summary(group[0])
+
+        # Update progress as summaries finish, counting duplicates too
+        completed += len(group)
+        core.update_summary_progress(repo_id, group[0]['original_name'], completed,
+                                     completed, len(functions))
+        return summary_data
+
+    results = await asyncio.gather(
+        *(summarize(group) for group in groups.values()), return_exceptions=True
+    )
+    summaries = dict(zip(groups.keys(), results))
+
+    return core.assemble_hierarchy(functions, groups, summaries, repo_id)
+
+async def api_response(handler, action, blocking=False):
+    # Handlers that may build an index run in the blocking pool; the rest
+    # only read in-memory state and answer straight from the event loop
+    data = await request.get_json(silent=True)
+    if blocking:
+        body, status = await run_blocking(core.handle_api_request, handler, data, action)
+    else:
+        body, status = core.handle_api_request(handler, data, action)
+    return jsonify(body), status
+
+@app.route("/")
+async def entry():
+    return await render_template("entry.html")
+
+@app.route("/analyze", methods=["POST"])
+async def analyze_repo():
+    try:
+        repo_url = core.require_repo_url(await request.get_json(silent=True) or {})
+        repo_path = await run_blocking(core.clone_or_update_repo, repo_url)
+        hierarchy = await build_hierarchy(repo_path, repo_url)
+        body = await run_blocking(core.finish_analysis, repo_url, hierarchy)
+    except Exception as e:
+        body, status = core.error_response(e, "analyzing repository")
+        return jsonify(body), status
+
+    # Store hierarchy in session
+    session['hierarchy'] = hierarchy
+    session['repo_url'] = repo_url
+    return jsonify(body)
+
+@app.route("/get_function_calls", methods=["POST"])
+async def get_function_calls():
+    return await api_response(core.function_calls_response, "extracting function calls")
+
+@app.route("/progress", methods=["POST"])
+async def check_progress():
+    return await api_response(core.progress_response, "checking progress")
+
+@app.route("/search", methods=["POST"])
+async def search_functions():
+    return await api_response(core.search_response, "searching functions", blocking=True)
+
+@app.route("/call_tree", methods=["POST"])
+async def get_call_tree():
+    return await api_response(core.call_tree_response, "building call tree", blocking=True)
+
+@app.route("/metrics", methods=["POST"])
+async def get_function_metrics():
+    return await api_response(core.metrics_response, "getting function metrics", blocking=True)
+
+@app.route("/llm_stats", methods=["GET"])
+async def llm_stats():
+    return await api_response(core.llm_stats_response, "getting LLM stats")
+
+@app.route("/results")
+async def show_results():
+    # Get hierarchy from session or provide empty list if not found
+    hierarchy_data = session.get('hierarchy', [])
+    return await render_template("index.html", hierarchy=hierarchy_data,
+                                 repo_url=session.get('repo_url', ''))
+
+@app.route("/repos", methods=["GET"])
+async def list_repos():
+    return await api_response(core.repos_response, "listing repositories")
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0', debug=True, port=6001)
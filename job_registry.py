@@ -0,0 +1,213 @@
+"""
+Bounded, expiring registry for per-repository job state.
+
+Replaces the module-level dicts that grew by one entry per analyzed repo:
+entries expire after a TTL, the least recently updated (or, with
+touch_on_read, used) entries are evicted past max_entries, and all access
+is locked. The registry can be persisted to a JSON file so job status
+survives a restart; unfinished jobs come back as interrupted. Running this
+module simulates thousands of analyses and checks that memory stays
+bounded.
+"""
+import os, json, time, threading, logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class JobRegistry:
+    def __init__(self, max_entries=1000, ttl=24 * 3600, persist_path=None, persist_interval=1.0,
+                 touch_on_read=False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Count reads as use too, making the TTL and eviction order least recently used
+        self.touch_on_read = touch_on_read
+        self.persist_path = persist_path
+        self.persist_interval = persist_interval
+        self._entries = OrderedDict()  # job id -> (last update time, value), oldest first
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._save_lock = threading.Lock()  # Serializes writes of persist_path
+        self._save_requested = threading.Event()
+        self._saver = None
+
+        if persist_path:
+            self._load()
+
+    def _expired(self, updated, now):
+        return self.ttl is not None and now - updated > self.ttl
+
+    def _evict(self, now):
+        # Entries are ordered by last update, so expired ones sit at the front
+        while self._entries:
+            job_id, (updated, _) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and not self._expired(updated, now):
+                break
+            del self._entries[job_id]
+            self._dirty = True
+
+    def _touch(self, job_id, value, now):
+        self._entries[job_id] = (now, value)
+        self._entries.move_to_end(job_id)
+        self._dirty = True
+        self._evict(now)
+
+    def set(self, job_id, value):
+        """Replace the state stored for a job"""
+        with self._lock:
+            now = time.time()
+            self._touch(job_id, value, now)
+            self._request_save()
+
+    def update(self, job_id, **fields):
+        """Merge fields into a job's state, creating it if needed"""
+        with self._lock:
+            now = time.time()
+            _, value = self._entries.get(job_id, (now, {}))
+            value = dict(value, **fields)
+            self._touch(job_id, value, now)
+            self._request_save()
+
+    def get(self, job_id, default=None):
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                return default
+            updated, value = entry
+            now = time.time()
+            if self._expired(updated, now):
+                del self._entries[job_id]
+                self._dirty = True
+                return default
+            if self.touch_on_read:
+                self._entries[job_id] = (now, value)
+                self._entries.move_to_end(job_id)
+                self._dirty = True
+            # Copy dict states so callers never mutate them outside the lock
+            return dict(value) if isinstance(value, dict) else value
+
+    def pop(self, job_id, default=None):
+        with self._lock:
+            entry = self._entries.pop(job_id, None)
+            if entry is None:
+                return default
+            self._dirty = True
+            return entry[1]
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _request_save(self):
+        # Saves happen on a background thread so callers, including the
+        # async event loop, never wait on JSON encoding or disk I/O
+        if not self.persist_path:
+            return
+        if self._saver is None:
+            self._saver = threading.Thread(target=self._save_loop, name="job-registry-save", daemon=True)
+            self._saver.start()
+        self._save_requested.set()
+
+    def _save_loop(self):
+        while True:
+            self._save_requested.wait()
+            self._save_requested.clear()
+            self.flush()
+            # Throttled so frequent progress updates coalesce into one write
+            time.sleep(self.persist_interval)
+
+    def flush(self):
+        """Write the registry to persist_path if it changed"""
+        if not self.persist_path:
+            return
+        with self._save_lock:
+            # Only the snapshot is taken under the registry lock; the write is not
+            with self._lock:
+                if not self._dirty:
+                    return
+                state = [[job_id, updated, value] for job_id, (updated, value) in self._entries.items()]
+                self._dirty = False
+            tmp_path = f"{self.persist_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                # Atomic swap so a crash never leaves a half-written file
+                os.replace(tmp_path, self.persist_path)
+            except (OSError, TypeError) as e:
+                logger.error(f"Could not persist job registry to {self.persist_path}: {str(e)}")
+                with self._lock:
+                    self._dirty = True
+
+    def _load(self):
+        try:
+            with open(self.persist_path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load job registry from {self.persist_path}: {str(e)}")
+            return
+
+        now = time.time()
+        for job_id, updated, value in sorted(state, key=lambda entry: entry[1]):
+            if self._expired(updated, now):
+                continue
+            # Work in progress died with the old process and will never finish
+            if isinstance(value, dict) and value.get('status') not in (None, 'complete', 'interrupted'):
+                value = dict(value, status='interrupted')
+                self._dirty = True
+            self._entries[job_id] = (updated, value)
+        self._evict(now)
+        logger.info(f"Restored {len(self._entries)} jobs from {self.persist_path}")
+
+if __name__ == "__main__":
+    import argparse, tempfile, tracemalloc
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Load-test the job registry with many distinct analyses")
+    parser.add_argument("--jobs", type=int, default=8000)
+    parser.add_argument("--functions", type=int, default=20, help="Progress updates per job")
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    persist_path = os.path.join(tempfile.mkdtemp(), "jobs.json")
+    registry = JobRegistry(max_entries=args.max_entries, persist_path=persist_path)
+
+    def run_job(i):
+        job_id = f"repo-{i:08d}"
+        registry.set(job_id, {'status': 'processing', 'progress': 0, 'current_function': '',
+                              'current_index': 0, 'total_functions': args.functions})
+        for index in range(args.functions):
+            registry.update(job_id, current_function=f"function_{index}", current_index=index + 1,
+                            progress=int(index / args.functions * 100))
+        registry.update(job_id, status='complete', progress=100)
+
+    tracemalloc.start()
+    checkpoints = []
+    batch_size = max(1, args.jobs // 4)
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for batch_start in range(0, args.jobs, batch_size):
+            batch_end = min(args.jobs, batch_start + batch_size)
+            list(executor.map(run_job, range(batch_start, batch_end)))
+            # Wait out any background save so its snapshot is not counted
+            registry.flush()
+            current, _ = tracemalloc.get_traced_memory()
+            checkpoints.append((batch_end, len(registry), current))
+
+    for jobs_done, entries, current in checkpoints:
+        print(f"{jobs_done:>8} jobs: {entries} entries, {current / 1024:.0f} KiB traced")
+        assert entries <= args.max_entries, f"{entries} entries exceeds max_entries {args.max_entries}"
+
+    # Once the registry is full, more jobs must not grow memory. Compare
+    # checkpoints taken after it filled, allowing some allocator noise.
+    full = [current for jobs_done, _, current in checkpoints if jobs_done >= args.max_entries]
+    if len(full) >= 2:
+        assert full[-1] <= full[0] * 1.5, f"Memory kept growing: {full[0]} -> {full[-1]} bytes"
+
+    registry.flush()
+    restored = JobRegistry(max_entries=args.max_entries, persist_path=persist_path)
+    print(f"Restored {len(restored)} entries after restart")
+    assert len(restored) == min(args.jobs, args.max_entries)
@@ -0,0 +1,363 @@
+"""
+Shared client for the chat completion API.
+
+Every LLM request goes through LLMClient so that request and token budgets
+are enforced client-side, identical in-flight prompts are only sent once,
+and latency is tracked. Run this module against llm_stub.py to load-test
+throughput offline:
+
+    python llm_stub.py --latency 0.5 --error-rate 0.05
+    python llm_client.py --url http://127.0.0.1:6002/v1/chat/completions --requests 500
+"""
+import os, time, threading, asyncio, logging
+from collections import deque
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+class LLMError(RuntimeError):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class RateLimited(LLMError):
+    """Raised on a 429, carrying how long the API asked us to wait"""
+    def __init__(self, message, retry_after):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(text):
+    """Rough token count, about four characters per token"""
+    return len(text) // 4 + 1
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate"""
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60 if per_minute else 0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """Take amount from the bucket and return how long to wait before using it"""
+        if not self.capacity:
+            return 0
+        with self.lock:
+            self._refill()
+            # The balance may go negative; later callers queue behind the debt
+            self.tokens -= amount
+            return max(0, -self.tokens / self.rate)
+
+    def adjust(self, amount):
+        """Return over-reserved tokens (or charge under-reserved ones)"""
+        if not self.capacity:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds):
+        """Drain the bucket so the next reservation waits at least seconds"""
+        if not self.capacity:
+            return
+        with self.lock:
+            self._refill()
+            # min() so overlapping pauses do not stack
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+class LatencyStats:
+    """Rolling latency and error counters for LLM requests"""
+    def __init__(self, window=1000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency, error=False):
+        with self.lock:
+            self.latencies.append(latency)
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            requests_sent = self.requests
+            errors = self.errors
+            coalesced = self.coalesced
+            rate_limited = self.rate_limited
+            throttled_seconds = self.throttled_seconds
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            "requests": requests_sent,
+            "errors": errors,
+            "coalesced": coalesced,
+            "rate_limited": rate_limited,
+            "throttled_seconds": round(throttled_seconds, 3),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": round(latencies[-1], 3) if latencies else None
+        }
+
+class LLMClient:
+    def __init__(self, url, api_key, model="deepseek-coder",
+                 requests_per_minute=None, tokens_per_minute=None, timeout=120,
+                 max_retries=3, backoff=1.0, max_backoff=60.0):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        # Retries after a 429, waiting for Retry-After or an exponential backoff
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        if requests_per_minute is None:
+            requests_per_minute = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "120"))
+        if tokens_per_minute is None:
+            tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.stats = LatencyStats()
+
+        # requests.Session is not documented as thread-safe, so each request thread gets its own
+        self._local = threading.local()
+        self._async_client = None
+
+        # In-flight requests by (prompt, max_tokens) for coalescing
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._async_inflight = {}
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    @property
+    def limits_enabled(self):
+        return bool(self.request_bucket.capacity or self.token_bucket.capacity)
+
+    def _payload(self, prompt, max_tokens):
+        return {
+            "messages": [{"role": "user", "content": prompt}],
+            "model": self.model,
+            "max_tokens": max_tokens,
+        }
+
+    def _reserve(self, prompt, max_tokens):
+        """Reserve budget for a request, returning (wait seconds, reserved tokens)"""
+        reserved = estimate_tokens(prompt) + max_tokens
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(reserved))
+        if wait:
+            with self.stats.lock:
+                self.stats.throttled_seconds += wait
+        return wait, reserved
+
+    def _handle_response(self, status_code, text, data, headers, reserved, latency, attempt):
+        if status_code == 429:
+            self.stats.record(latency, error=True)
+            delay = parse_retry_after(headers.get("Retry-After"))
+            if delay is None:
+                delay = self.backoff * 2 ** attempt
+            delay = min(delay, self.max_backoff)
+            with self.stats.lock:
+                self.stats.rate_limited += 1
+
+            # The request was rejected, so give its tokens back, then hold
+            # every caller off both buckets until the API is ready again
+            self.token_bucket.adjust(reserved)
+            self.request_bucket.pause(delay)
+            self.token_bucket.pause(delay)
+            raise RateLimited(f"API Error: 429 - {text}", delay)
+
+        if status_code != 200:
+            self.stats.record(latency, error=True)
+            raise LLMError(f"API Error: {status_code} - {text}", status_code)
+        self.stats.record(latency)
+
+        # Settle the token reservation against actual usage
+        used = (data.get('usage') or {}).get('total_tokens')
+        if used:
+            self.token_bucket.adjust(reserved - used)
+        return data
+
+    def _send(self, prompt, max_tokens, timeout):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._send_once(prompt, max_tokens, timeout, attempt)
+            except RateLimited as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Rate limited, retrying in {e.retry_after:.1f}s")
+                # With both limits disabled the paused buckets cannot hold us off
+                if not self.limits_enabled:
+                    time.sleep(e.retry_after)
+
+    def _send_once(self, prompt, max_tokens, timeout, attempt):
+        wait, reserved = self._reserve(prompt, max_tokens)
+        if wait:
+            time.sleep(wait)
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=self._payload(prompt, max_tokens),
+                timeout=timeout or self.timeout
+            )
+            data = response.json() if response.status_code == 200 else None
+        except Exception:
+            self.stats.record(time.perf_counter() - start, error=True)
+            raise
+        return self._handle_response(response.status_code, response.text, data, response.headers,
+                                     reserved, time.perf_counter() - start, attempt)
+
+    def chat(self, prompt, max_tokens=500, timeout=None):
+        """Send a prompt and return the response JSON, raising LLMError on API errors"""
+        key = (prompt, max_tokens)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_owner:
+            # An identical prompt is already in flight, share its result
+            with self.stats.lock:
+                self.stats.coalesced += 1
+            return future.result()
+
+        try:
+            result = self._send(prompt, max_tokens, timeout)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(timeout=self.timeout)
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def _asend(self, prompt, max_tokens, timeout):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._asend_once(prompt, max_tokens, timeout, attempt)
+            except RateLimited as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Rate limited, retrying in {e.retry_after:.1f}s")
+                if not self.limits_enabled:
+                    await asyncio.sleep(e.retry_after)
+
+    async def _asend_once(self, prompt, max_tokens, timeout, attempt):
+        wait, reserved = self._reserve(prompt, max_tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+        start = time.perf_counter()
+        try:
+            response = await self.async_client.post(
+                self.url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=self._payload(prompt, max_tokens),
+                timeout=timeout or self.timeout
+            )
+            data = response.json() if response.status_code == 200 else None
+        except Exception:
+            self.stats.record(time.perf_counter() - start, error=True)
+            raise
+        return self._handle_response(response.status_code, response.text, data, response.headers,
+                                     reserved, time.perf_counter() - start, attempt)
+
+    async def achat(self, prompt, max_tokens=500, timeout=None):
+        """Async counterpart of chat for use on the event loop"""
+        key = (prompt, max_tokens)
+        task = self._async_inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._asend(prompt, max_tokens, timeout))
+            self._async_inflight[key] = task
+            task.add_done_callback(lambda _: self._async_inflight.pop(key, None))
+        else:
+            with self.stats.lock:
+                self.stats.coalesced += 1
+        # Shield so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(task)
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Load-test the LLM client against an endpoint")
+    parser.add_argument("--url", default="http://127.0.0.1:6002/v1/chat/completions")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--unique-prompts", type=int, default=50)
+    parser.add_argument("--rpm", type=int, default=6000)
+    parser.add_argument("--tpm", type=int, default=10000000)
+    args = parser.parse_args()
+
+    client = LLMClient(args.url, "stub", requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+
+    def run(i):
+        try:
+            client.chat(f"Summarize function number {i % args.unique_prompts}")
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        succeeded = sum(executor.map(run, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{succeeded}/{args.requests} calls succeeded in {elapsed:.2f}s "
+          f"({args.requests / elapsed:.1f} calls/s)")
+    print(client.stats.snapshot())
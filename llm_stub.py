@@ -0,0 +1,79 @@
+"""
+Local stand-in for the chat completion API, for offline load testing.
+
+Answers every POST with a completion that both analyze_readme and
+generate_function_summary can parse, after a configurable delay, and fails
+a configurable fraction of requests with 429/500. Point the app at it with
+DEEPSEEK_URL=http://127.0.0.1:6002/v1/chat/completions.
+"""
+import json, random, time, argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    jitter = 0.1
+    error_rate = 0.0
+
+    retry_after = 1
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+        if random.random() < self.error_rate:
+            status = random.choice([429, 500])
+            headers = {"Retry-After": str(self.retry_after)} if status == 429 else None
+            self._send_json(status, {"error": {"message": f"Stub error {status}"}}, headers)
+            return
+
+        content = json.dumps({
+            "summary": "Stub summary",
+            "description": "Generated by the local LLM stub.",
+            "entries": []
+        })
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        self._send_json(200, {
+            "choices": [{"message": {"role": "assistant", "content": f"```json\n{content}\n```"}}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local chat completion API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6002)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Standard deviation of the response time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.jitter = args.jitter
+    StubHandler.error_rate = args.error_rate
+    StubHandler.retry_after = args.retry_after
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"LLM stub listening on http://{args.host}:{args.port}")
+    server.serve_forever()